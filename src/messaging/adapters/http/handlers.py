@@ -1,10 +1,12 @@
 from datetime import datetime
+import math
 import uuid
 
-from fastapi import Body, Depends, FastAPI, Path, status
+from fastapi import Body, Depends, FastAPI, HTTPException, Path, Request, status
+from fastapi.responses import JSONResponse
 
 from messaging.domain import models
-from messaging.service import commands
+from messaging.service import admission, commands
 from messaging.service.service import Service
 
 from . import schema, utils
@@ -14,6 +16,25 @@ app = FastAPI()
 # pyright: reportCallInDefaultInitializer = false
 
 
+@app.exception_handler(admission.Overloaded)
+async def overloaded(_: Request, exc: admission.Overloaded) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
+@app.exception_handler(models.PayloadModeMismatch)
+async def payload_mode_mismatch(_: Request, exc: models.PayloadModeMismatch) -> JSONResponse:
+    return JSONResponse(status_code=status.HTTP_409_CONFLICT, content={"detail": str(exc)})
+
+
+@app.exception_handler(admission.DeadlineExceeded)
+async def deadline_exceeded(_: Request, exc: admission.DeadlineExceeded) -> JSONResponse:
+    return JSONResponse(status_code=status.HTTP_504_GATEWAY_TIMEOUT, content={"detail": str(exc)})
+
+
 @app.post(
     "/channels/{channel}/publish",
     response_model=schema.PublishResponse,
@@ -22,6 +43,8 @@ app = FastAPI()
 async def publish(
     channel: models.Channel = Path(..., min_length=1),
     body: schema.PublishRequest = Body(...),
+    deadline: models.Deadline | None = Depends(utils.optional_deadline),
+    idempotency_key: str | None = Depends(utils.optional_idempotency_key),
     svc: Service = Depends(utils.get_service),
 ):
     published_at = datetime.now()
@@ -31,12 +54,86 @@ async def publish(
             channel=channel,
             payload=body.payload,
             published_at=published_at,
-        )
+        ),
+        deadline,
+        idempotency_key,
+    )
+    new_id = await svc.publish(cmd)
+    return schema.PublishResponse(id=new_id)
+
+
+@app.post(
+    "/channels/{channel}/publish/raw",
+    response_model=schema.PublishResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def publish_raw(
+    channel: models.Channel = Path(..., min_length=1),
+    payload: bytes = Depends(utils.raw_payload),
+    deadline: models.Deadline | None = Depends(utils.optional_deadline),
+    idempotency_key: str | None = Depends(utils.optional_idempotency_key),
+    svc: Service = Depends(utils.get_service),
+):
+    published_at = datetime.now()
+    cmd = commands.Publish(
+        models.Message(
+            id=models.MessageID(uuid.uuid4()),
+            channel=channel,
+            payload=payload,
+            published_at=published_at,
+        ),
+        deadline,
+        idempotency_key,
     )
     new_id = await svc.publish(cmd)
     return schema.PublishResponse(id=new_id)
 
 
+@app.put(
+    "/channels/{channel}/payload-mode",
+    status_code=status.HTTP_204_NO_CONTENT,
+)
+async def set_payload_mode(
+    channel: models.Channel = Path(..., min_length=1),
+    body: schema.PayloadModeRequest = Body(...),
+    deadline: models.Deadline | None = Depends(utils.optional_deadline),
+    svc: Service = Depends(utils.get_service),
+):
+    cmd = commands.SetPayloadMode(channel, body.raw, deadline)
+    await svc.set_payload_mode(cmd)
+
+
+@app.post(
+    "/channels/publish",
+    response_model=schema.PublishFanOutResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def publish_fanout(
+    body: schema.PublishFanOutRequest = Body(...),
+    deadline: models.Deadline | None = Depends(utils.optional_deadline),
+    idempotency_key: str | None = Depends(utils.optional_idempotency_key),
+    svc: Service = Depends(utils.get_service),
+):
+    if idempotency_key is not None:
+        # refuse rather than ignore it, so a client relying on it doesn't publish twice on retry
+        raise HTTPException(status_code=400, detail="Idempotency-Key is not supported for fan-out publishes")
+    published_at = datetime.now()
+    cmd = commands.PublishFanOut(
+        [
+            models.Message(
+                id=models.MessageID(uuid.uuid4()),
+                channel=channel,
+                payload=body.payload,
+                published_at=published_at,
+            )
+            for channel in dict.fromkeys(body.channels)
+        ],
+        deadline,
+    )
+    new_ids = await svc.publish_fanout(cmd)
+    return schema.PublishFanOutResponse(ids={m.channel: m.id for m in cmd.messages if m.id in new_ids})
+
+
 @app.get(
     "/channels/{channel}/messages/unread",
     response_model=schema.GetMessagesResponse,
@@ -44,9 +141,10 @@ async def publish(
 async def get_unread_messages(
     channel: models.Channel = Path(..., min_length=1),
     consumer: models.Consumer = Depends(utils.require_consumer),
+    deadline: models.Deadline | None = Depends(utils.optional_deadline),
     svc: Service = Depends(utils.get_service),
 ):
-    cmd = commands.ListUnread(channel, consumer)
+    cmd = commands.ListUnread(channel, consumer, deadline)
     messages = await svc.list_unread(cmd)
     return schema.GetMessagesResponse(messages=messages)
 
@@ -58,9 +156,10 @@ async def get_unread_messages(
 async def get_messages_from_sequence(
     channel: models.Channel = Path(..., min_length=1),
     from_seq: int = Path(..., ge=0),
+    deadline: models.Deadline | None = Depends(utils.optional_deadline),
     svc: Service = Depends(utils.get_service),
 ):
-    cmd = commands.ListFromSequence(channel, from_seq)
+    cmd = commands.ListFromSequence(channel, from_seq, deadline)
     messages = await svc.list_from_sequence(cmd)
     return schema.GetMessagesResponse(messages=messages)
 
@@ -72,7 +171,37 @@ async def get_messages_from_sequence(
 async def ack_message(
     id: uuid.UUID = Path(...),
     consumer: models.Consumer = Depends(utils.require_consumer),
+    deadline: models.Deadline | None = Depends(utils.optional_deadline),
     svc: Service = Depends(utils.get_service),
 ):
-    cmd = commands.Ack(models.MessageID(id), consumer, read_at=datetime.now())
+    cmd = commands.Ack(models.MessageID(id), consumer, read_at=datetime.now(), deadline=deadline)
     await svc.ack(cmd)
+
+
+@app.get(
+    "/channels/{channel}/consumers/lag",
+    response_model=schema.ListConsumerLagResponse,
+)
+async def list_consumer_lag(
+    channel: models.Channel = Path(..., min_length=1),
+    deadline: models.Deadline | None = Depends(utils.optional_deadline),
+    svc: Service = Depends(utils.get_service),
+):
+    cmd = commands.ListConsumerLag(channel, deadline)
+    lags = await svc.list_consumer_lag(cmd)
+    return schema.ListConsumerLagResponse(consumers=lags)
+
+
+@app.get(
+    "/channels/{channel}/consumers/{consumer}/lag",
+    response_model=schema.GetConsumerLagResponse,
+)
+async def get_consumer_lag(
+    channel: models.Channel = Path(..., min_length=1),
+    consumer: models.Consumer = Path(..., min_length=1),
+    deadline: models.Deadline | None = Depends(utils.optional_deadline),
+    svc: Service = Depends(utils.get_service),
+):
+    cmd = commands.GetConsumerLag(channel, consumer, deadline)
+    lag = await svc.consumer_lag(cmd)
+    return schema.GetConsumerLagResponse(lag=lag)
@@ -1,7 +1,13 @@
-from pydantic import BaseModel
+from typing import Annotated
+
+from pydantic import BaseModel, ConfigDict, Field
 
 from messaging.domain import models
 
+MAX_FANOUT = 100
+MAX_RAW_PAYLOAD_BYTES = 1024 * 1024
+MAX_REQUEST_TIMEOUT_MS = 2_147_483_647  # largest statement_timeout Postgres accepts
+
 
 class PublishRequest(BaseModel):
     payload: models.JSON
@@ -11,5 +17,29 @@ class PublishResponse(BaseModel):
     id: models.MessageID
 
 
+class PublishFanOutRequest(BaseModel):
+    channels: list[Annotated[models.Channel, Field(min_length=1)]] = Field(min_length=1, max_length=MAX_FANOUT)
+    payload: models.JSON
+
+
+class PublishFanOutResponse(BaseModel):
+    ids: dict[models.Channel, models.MessageID]
+
+
+class PayloadModeRequest(BaseModel):
+    raw: bool
+
+
 class GetMessagesResponse(BaseModel):
+    # raw payloads are returned as URL-safe base64 strings, JSON payloads as objects
+    model_config = ConfigDict(ser_json_bytes="base64", val_json_bytes="base64")
+
     messages: list[models.Message]
+
+
+class GetConsumerLagResponse(BaseModel):
+    lag: models.ConsumerLag
+
+
+class ListConsumerLagResponse(BaseModel):
+    consumers: list[models.ConsumerLag]
@@ -4,6 +4,8 @@ from fastapi import Header, HTTPException, Request
 from messaging.domain import models
 from messaging.service.service import Service
 
+from . import schema
+
 
 async def require_consumer(
     consumer: models.Consumer | None = Header(default=None, alias="X-Consumer"),
@@ -13,6 +15,34 @@ async def require_consumer(
     return consumer
 
 
+async def optional_deadline(
+    timeout_ms: int | None = Header(default=None, alias="X-Request-Timeout-Ms", ge=0, le=schema.MAX_REQUEST_TIMEOUT_MS),
+) -> models.Deadline | None:
+    if timeout_ms is None:
+        return None
+    return models.Deadline.after(timeout_ms / 1000)
+
+
+async def optional_idempotency_key(
+    key: str | None = Header(default=None, alias="Idempotency-Key", min_length=1, max_length=255),
+) -> str | None:
+    return key
+
+
+async def raw_payload(request: Request) -> bytes:
+    """The request body, refused with 413 as soon as it exceeds MAX_RAW_PAYLOAD_BYTES."""
+    too_large = HTTPException(status_code=413, detail=f"raw payload exceeds {schema.MAX_RAW_PAYLOAD_BYTES} bytes")
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > schema.MAX_RAW_PAYLOAD_BYTES:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > schema.MAX_RAW_PAYLOAD_BYTES:
+            raise too_large
+    return bytes(body)
+
+
 def get_service(request: Request) -> Service:
     svc: Service | None = getattr(request.app.state, "service", None)  # pyright: ignore[reportAny]
     if not isinstance(svc, Service):
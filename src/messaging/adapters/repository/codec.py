@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+import zstandard
+
+# Below this size compression rarely pays for the CPU and the frame header.
+COMPRESS_THRESHOLD = 1024
+# From this (uncompressed) size on, (de)compression runs in a worker thread instead of on the event loop.
+OFFLOAD_THRESHOLD = 64 * 1024
+ZSTD = "zstd"
+
+
+class _Contexts(threading.local):
+    """zstd contexts must not be shared between threads, so every thread gets its own."""
+
+    def __init__(self) -> None:
+        self.compressor: zstandard.ZstdCompressor = zstandard.ZstdCompressor(level=3)
+        self.decompressor: zstandard.ZstdDecompressor = zstandard.ZstdDecompressor()
+
+
+_contexts = _Contexts()
+
+
+def encode(data: bytes) -> tuple[bytes, str | None]:
+    """Compress `data` for storage if it is large enough and actually shrinks.
+
+    Returns the stored bytes and the codec name, or None when stored as-is.
+    """
+    if len(data) < COMPRESS_THRESHOLD:
+        return data, None
+    compressed = _contexts.compressor.compress(data)
+    if len(compressed) >= len(data):
+        return data, None
+    return compressed, ZSTD
+
+
+def decode(data: bytes, codec: str | None) -> bytes:
+    if codec is None:
+        return data
+    if codec == ZSTD:
+        return _contexts.decompressor.decompress(data)
+    raise ValueError(f"unknown payload codec: {codec}")
+
+
+async def encode_async(data: bytes) -> tuple[bytes, str | None]:
+    """`encode`, in a worker thread for large payloads."""
+    if len(data) < OFFLOAD_THRESHOLD:
+        return encode(data)
+    return await asyncio.to_thread(encode, data)
+
+
+async def decode_async(data: bytes, codec: str | None) -> bytes:
+    """`decode`, in a worker thread for payloads that decompress to a large size."""
+    if codec != ZSTD or zstandard.frame_content_size(data) < OFFLOAD_THRESHOLD:
+        return decode(data, codec)
+    return await asyncio.to_thread(decode, data, codec)
@@ -0,0 +1,16 @@
+-- Number of distinct messages each consumer has acked per channel, maintained by
+-- mark_read. Together with channel_sequences.last_seq it gives consumer lag
+-- without scanning the backlog.
+CREATE TABLE IF NOT EXISTS consumer_acks (
+    channel  TEXT NOT NULL,
+    consumer TEXT NOT NULL,
+    acked    BIGINT NOT NULL,
+    PRIMARY KEY (channel, consumer)
+);
+
+INSERT INTO consumer_acks (channel, consumer, acked)
+SELECT m.channel, r.consumer, count(*)
+FROM message_reads r
+JOIN messages m ON m.id = r.message_id
+GROUP BY m.channel, r.consumer
+ON CONFLICT (channel, consumer) DO NOTHING;
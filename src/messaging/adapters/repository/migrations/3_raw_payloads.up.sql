@@ -0,0 +1,22 @@
+-- Opt-in per-channel opaque payloads. Raw payloads are stored as bytes in
+-- payload_raw (compressed by the application when payload_codec is set) and
+-- never parsed by the database.
+ALTER TABLE channel_sequences
+    ADD COLUMN IF NOT EXISTS raw_payloads BOOLEAN NOT NULL DEFAULT false;
+
+ALTER TABLE messages
+    ALTER COLUMN payload DROP NOT NULL,
+    ADD COLUMN IF NOT EXISTS payload_raw BYTEA,
+    ADD COLUMN IF NOT EXISTS payload_codec TEXT;
+
+-- already compressed by the application, don't let TOAST try again
+ALTER TABLE messages ALTER COLUMN payload_raw SET STORAGE EXTERNAL;
+
+DO $$
+BEGIN
+    ALTER TABLE messages
+        ADD CONSTRAINT messages_one_payload CHECK ((payload IS NULL) <> (payload_raw IS NULL));
+EXCEPTION
+    WHEN duplicate_object THEN NULL;
+END
+$$;
@@ -0,0 +1,8 @@
+-- Producer-supplied Idempotency-Key, unique per channel. A retried publish with
+-- the same key returns the original message instead of inserting a duplicate.
+ALTER TABLE messages
+    ADD COLUMN IF NOT EXISTS idempotency_key TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_channel_idempotency_key
+    ON messages (channel, idempotency_key)
+    WHERE idempotency_key IS NOT NULL;
@@ -0,0 +1,42 @@
+-- Reads carry the message's channel and seq, so list_unread can anti-join a
+-- consumer's reads on one channel in seq order instead of probing message_reads
+-- once per message.
+ALTER TABLE message_reads
+    ADD COLUMN IF NOT EXISTS channel TEXT,
+    ADD COLUMN IF NOT EXISTS seq BIGINT;
+
+UPDATE message_reads r
+SET channel = m.channel, seq = m.seq
+FROM messages m
+WHERE m.id = r.message_id AND r.channel IS NULL;
+
+ALTER TABLE message_reads
+    ALTER COLUMN channel SET NOT NULL,
+    ALTER COLUMN seq SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_message_reads_consumer_channel_seq
+    ON message_reads (consumer, channel, seq);
+
+-- Per-consumer watermark: every message on the channel with seq <= acked_through
+-- has been acked. list_unread only looks past it, so a caught-up consumer does
+-- not walk the whole channel. Maintained by mark_read.
+ALTER TABLE consumer_acks
+    ADD COLUMN IF NOT EXISTS acked_through BIGINT NOT NULL DEFAULT -1;
+
+UPDATE consumer_acks a
+SET acked_through = coalesce(
+    (
+        SELECT m.seq - 1
+        FROM messages m
+        WHERE m.channel = a.channel
+          AND NOT EXISTS (
+            SELECT 1
+            FROM message_reads r
+            WHERE r.consumer = a.consumer AND r.channel = m.channel AND r.seq = m.seq
+          )
+        ORDER BY m.seq
+        LIMIT 1
+    ),
+    (SELECT max(m.seq) FROM messages m WHERE m.channel = a.channel),
+    -1
+);
@@ -1,72 +1,191 @@
+import asyncio
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 from datetime import datetime
 import json
 from typing import cast
 
-from asyncpg import Pool, Record
+from asyncpg import Pool, QueryCanceledError, Record
 from asyncpg.pool import PoolConnectionProxy
 from asyncpg.transaction import Transaction
 
 from messaging.domain import models
 
+from . import codec
+
+MAX_STATEMENT_TIMEOUT_MS = 2_147_483_647
+
 
 class Postgres:
-    def __init__(self, conn: PoolConnectionProxy, tx: Transaction):
+    def __init__(self, conn: PoolConnectionProxy, tx: Transaction, deadline: models.Deadline | None = None):
         self._conn: PoolConnectionProxy = conn
         self._tx: Transaction = tx
+        self._deadline: models.Deadline | None = deadline
+
+    def _timeout(self) -> float | None:
+        """Time left on the deadline, re-read for every call so that earlier calls use it up."""
+        if self._deadline is None:
+            return None
+        if self._deadline.expired:
+            raise TimeoutError("deadline expired")
+        return self._deadline.remaining()
 
     async def commit(self) -> None:
-        await self._tx.commit()
+        async with asyncio.timeout(self._timeout()):
+            await self._tx.commit()
 
-    async def add(self, msg: models.Message) -> models.MessageID:
+    async def add(self, msg: models.Message, idempotency_key: str | None = None) -> models.MessageID:
+        """Insert `msg`, or return the id of the message already published on the
+        channel under `idempotency_key` without allocating a new sequence number."""
+        query = """
+        WITH existing AS (
+          SELECT id
+          FROM messages
+          WHERE channel = $2 AND idempotency_key = $7
+        ),
+        next AS (
+          INSERT INTO channel_sequences (channel, last_seq)
+          SELECT $2, 0
+          WHERE NOT EXISTS (SELECT 1 FROM existing)
+          ON CONFLICT (channel)
+          DO UPDATE SET last_seq = channel_sequences.last_seq + 1
+          RETURNING last_seq, raw_payloads
+        ),
+        inserted AS (
+          INSERT INTO messages (id, seq, channel, payload, payload_raw, payload_codec, published_at, idempotency_key)
+          SELECT $1::uuid, next.last_seq, $2::text, $3::jsonb, $5::bytea, $6::text, $4::timestamptz, $7::text
+          FROM next
+          WHERE next.raw_payloads = ($5::bytea IS NOT NULL)
+          ON CONFLICT (channel, idempotency_key) WHERE idempotency_key IS NOT NULL
+          DO NOTHING
+          RETURNING id
+        )
+        SELECT id FROM inserted
+        UNION ALL
+        SELECT id FROM existing
+        """
+        payload, raw, raw_codec = await _encode_payload(msg.payload)
+        new_id = await self._conn.fetchval(
+            query,
+            msg.id,
+            msg.channel,
+            payload,
+            msg.published_at,
+            raw,
+            raw_codec,
+            idempotency_key,
+            timeout=self._timeout(),
+        )
+        if new_id is not None:
+            return cast(models.MessageID, new_id)
+        if idempotency_key is not None:
+            # a concurrent publish with the same key committed first; its row is visible now
+            existing = await self._conn.fetchval(
+                "SELECT id FROM messages WHERE channel = $1 AND idempotency_key = $2",
+                msg.channel,
+                idempotency_key,
+                timeout=self._timeout(),
+            )
+            if existing is not None:
+                raise models.DuplicateIdempotencyKey(cast(models.MessageID, existing))
+        raise models.PayloadModeMismatch(f"payload does not match the payload mode of channel {msg.channel}")
+
+    async def add_fanout(self, msgs: list[models.Message]) -> list[models.MessageID]:
+        """Insert one event into several channels in a single round trip.
+
+        The messages must target distinct channels and share payload and published_at;
+        the payload is sent once. Sequence rows are locked in channel order so
+        overlapping fan-outs can't deadlock.
+        """
         query = """
         WITH next AS (
           INSERT INTO channel_sequences (channel, last_seq)
-          VALUES ($2, 0)
+          SELECT channel, 0
+          FROM unnest($2::text[]) AS c(channel)
+          ORDER BY channel
           ON CONFLICT (channel)
           DO UPDATE SET last_seq = channel_sequences.last_seq + 1
-          RETURNING last_seq
+          RETURNING channel, last_seq, raw_payloads
         )
-        INSERT INTO messages (id, seq, channel, payload, published_at)
-        SELECT $1::uuid, next.last_seq, $2::text, $3::jsonb, $4::timestamptz
-        FROM next
+        INSERT INTO messages (id, seq, channel, payload, payload_raw, payload_codec, published_at)
+        SELECT t.id, next.last_seq, t.channel, $3::jsonb, $5::bytea, $6::text, $4::timestamptz
+        FROM unnest($1::uuid[], $2::text[]) AS t(id, channel)
+        JOIN next ON next.channel = t.channel
+        WHERE next.raw_payloads = ($5::bytea IS NOT NULL)
         RETURNING id
         """
-        return cast(
-            models.MessageID,
-            await self._conn.fetchval(
-                query,
-                msg.id,
-                msg.channel,
-                json.dumps(msg.payload),
-                msg.published_at,
-            ),
+        first = msgs[0]
+        payload, raw, raw_codec = await _encode_payload(first.payload)
+        rows: list[Record] = await self._conn.fetch(
+            query,
+            [m.id for m in msgs],
+            [m.channel for m in msgs],
+            payload,
+            first.published_at,
+            raw,
+            raw_codec,
+            timeout=self._timeout(),
         )
+        if len(rows) != len(msgs):
+            raise models.PayloadModeMismatch("payload does not match the payload mode of every target channel")
+        return [m.id for m in msgs]
+
+    async def set_payload_mode(self, channel: models.Channel, raw: bool) -> None:
+        # last_seq = -1 so the first publish on a new channel still gets seq 0
+        query = """
+        INSERT INTO channel_sequences (channel, last_seq, raw_payloads)
+        VALUES ($1, -1, $2)
+        ON CONFLICT (channel)
+        DO UPDATE SET raw_payloads = EXCLUDED.raw_payloads
+        """
+        _ = await self._conn.execute(query, channel, raw, timeout=self._timeout())
 
     async def list_unread(self, channel: models.Channel, consumer: models.Consumer) -> list[models.Message]:
+        # the watermark is fetched up front rather than in a subquery so the planner sees
+        # its value and only ranges over the channel's tail for a caught-up consumer.
+        # Reading registers the consumer, so one that never acks still shows up in lag.
+        watermark = """
+        WITH registered AS (
+          INSERT INTO consumer_acks (channel, consumer, acked)
+          VALUES ($1, $2, 0)
+          ON CONFLICT (channel, consumer) DO NOTHING
+          RETURNING acked_through
+        )
+        SELECT acked_through FROM registered
+        UNION ALL
+        SELECT acked_through FROM consumer_acks WHERE channel = $1 AND consumer = $2
+        """
+        # r.seq > $3 is implied by r.seq = m.seq but bounds the reads side for the planner
         query = """
-        SELECT m.id, m.channel, m.payload, m.published_at
+        SELECT m.id, m.channel, m.payload, m.payload_raw, m.payload_codec, m.published_at
         FROM messages m
-        LEFT JOIN message_reads r
-          ON m.id = r.message_id AND r.consumer = $2
-        WHERE r.message_id IS NULL
-          AND m.channel = $1
+        WHERE m.channel = $1
+          AND m.seq > $3
+          AND NOT EXISTS (
+            SELECT 1
+            FROM message_reads r
+            WHERE r.consumer = $2 AND r.channel = $1 AND r.seq > $3 AND r.seq = m.seq
+          )
         ORDER BY m.seq ASC
         """
-        rows: list[Record] = await self._conn.fetch(query, channel, consumer)
-        return list(map(_to_message, rows))
+        acked_through = cast(
+            int | None, await self._conn.fetchval(watermark, channel, consumer, timeout=self._timeout())
+        )
+        rows: list[Record] = await self._conn.fetch(
+            query, channel, consumer, -1 if acked_through is None else acked_through, timeout=self._timeout()
+        )
+        return [await _to_message(r) for r in rows]
 
     async def list_from_sequence(self, channel: models.Channel, from_sequence: int) -> list[models.Message]:
         query = """
-        SELECT m.id, m.channel, m.payload, m.published_at
+        SELECT m.id, m.channel, m.payload, m.payload_raw, m.payload_codec, m.published_at
         FROM messages m
         WHERE m.channel = $1
           AND m.seq >= $2
         ORDER BY m.seq ASC
         """
-        rows: list[Record] = await self._conn.fetch(query, channel, from_sequence)
-        return list(map(_to_message, rows))
+        rows: list[Record] = await self._conn.fetch(query, channel, from_sequence, timeout=self._timeout())
+        return [await _to_message(r) for r in rows]
 
     async def mark_read(
         self,
@@ -74,13 +193,73 @@ class Postgres:
         consumer: models.Consumer,
         read_at: datetime,
     ) -> None:
+        # xmax = 0 only for freshly inserted rows, so re-acks don't bump the counter.
+        # An unknown message_id leaves channel and seq NULL and fails like before.
+        # acked_through moves up to just before the first message still unread; the
+        # read inserted here is not visible to this statement, hence r.seq <> read.seq.
+        # Messages commit in seq order per channel (channel_sequences row lock), so
+        # nothing can appear later below a visible seq.
+        query = """
+        WITH read AS (
+          INSERT INTO message_reads (message_id, consumer, read_at, channel, seq)
+          SELECT $1, $2, $3, m.channel, m.seq
+          FROM (VALUES (1)) AS one
+          LEFT JOIN messages m ON m.id = $1
+          ON CONFLICT (message_id, consumer)
+          DO UPDATE SET read_at = EXCLUDED.read_at
+          RETURNING channel, seq, (xmax = 0) AS inserted
+        ),
+        acked AS (
+          SELECT read.channel, read.seq, coalesce(a.acked_through, -1) AS acked_through
+          FROM read
+          LEFT JOIN consumer_acks a ON a.channel = read.channel AND a.consumer = $2
+          WHERE read.inserted
+        )
+        INSERT INTO consumer_acks (channel, consumer, acked, acked_through)
+        SELECT acked.channel, $2, 1, coalesce(
+          (
+            SELECT m.seq - 1
+            FROM messages m
+            WHERE m.channel = acked.channel
+              AND m.seq > acked.acked_through
+              AND m.seq <> acked.seq
+              AND NOT EXISTS (
+                SELECT 1
+                FROM message_reads r
+                WHERE r.consumer = $2 AND r.channel = m.channel AND r.seq = m.seq
+              )
+            ORDER BY m.seq
+            LIMIT 1
+          ),
+          (SELECT max(m.seq) FROM messages m WHERE m.channel = acked.channel)
+        )
+        FROM acked
+        ON CONFLICT (channel, consumer)
+        DO UPDATE SET acked = consumer_acks.acked + 1,
+                      acked_through = greatest(consumer_acks.acked_through, EXCLUDED.acked_through)
+        """
+        _ = await self._conn.execute(query, message_id, consumer, read_at, timeout=self._timeout())
+
+    async def consumer_lag(self, channel: models.Channel, consumer: models.Consumer) -> models.ConsumerLag:
         query = """
-        INSERT INTO message_reads (message_id, consumer, read_at)
-        VALUES ($1, $2, $3)
-        ON CONFLICT (message_id, consumer)
-        DO UPDATE SET read_at = EXCLUDED.read_at
+        SELECT $1::text AS channel,
+               $2::text AS consumer,
+               COALESCE((SELECT last_seq + 1 FROM channel_sequences WHERE channel = $1), 0) AS published,
+               COALESCE((SELECT acked FROM consumer_acks WHERE channel = $1 AND consumer = $2), 0) AS acked
         """
-        _ = await self._conn.execute(query, message_id, consumer, read_at)
+        row = await self._conn.fetchrow(query, channel, consumer, timeout=self._timeout())
+        return _to_consumer_lag(cast(Record, row))
+
+    async def list_consumer_lag(self, channel: models.Channel) -> list[models.ConsumerLag]:
+        query = """
+        SELECT a.channel, a.consumer, s.last_seq + 1 AS published, a.acked
+        FROM consumer_acks a
+        JOIN channel_sequences s ON s.channel = a.channel
+        WHERE a.channel = $1
+        ORDER BY a.consumer ASC
+        """
+        rows: list[Record] = await self._conn.fetch(query, channel, timeout=self._timeout())
+        return list(map(_to_consumer_lag, rows))
 
 
 class PostgresManager:
@@ -88,26 +267,63 @@ class PostgresManager:
         self._pool: Pool = pool
 
     @asynccontextmanager
-    async def transaction(self) -> AsyncIterator[Postgres]:
-        async with self._pool.acquire() as conn:
-            tx = conn.transaction()
-            await tx.start()
-            try:
-                yield Postgres(conn, tx)
-            finally:
+    async def transaction(self, deadline: models.Deadline | None = None) -> AsyncIterator[Postgres]:
+        """Open a transaction. With a `deadline`, everything from waiting for a connection
+        to the commit is bounded by the time left on it, as is the server side
+        `statement_timeout`, and expiry surfaces as `TimeoutError`."""
+        async with asyncio.timeout(None if deadline is None else deadline.remaining()):
+            async with self._pool.acquire() as conn:
+                tx = conn.transaction()
+                await tx.start()
                 try:
-                    await tx.rollback()
-                except Exception:
-                    pass
+                    if deadline is not None:
+                        statement_timeout = str(min(MAX_STATEMENT_TIMEOUT_MS, max(1, int(deadline.remaining() * 1000))))
+                        _ = await conn.execute("SELECT set_config('statement_timeout', $1, true)", statement_timeout)
+                    yield Postgres(conn, tx, deadline)
+                except QueryCanceledError as e:
+                    if deadline is None:
+                        raise
+                    raise TimeoutError("statement_timeout exceeded") from e
+                finally:
+                    try:
+                        await tx.rollback()
+                    except Exception:
+                        pass
 
     async def close(self) -> None:
         await self._pool.close()
 
 
-def _to_message(r: Record) -> models.Message:
+async def _encode_payload(payload: models.Payload) -> tuple[str | None, bytes | None, str | None]:
+    """Split a payload into the (payload, payload_raw, payload_codec) columns."""
+    if isinstance(payload, bytes):
+        raw, raw_codec = await codec.encode_async(payload)
+        return None, raw, raw_codec
+    return json.dumps(payload), None, None
+
+
+async def _to_message(r: Record) -> models.Message:
+    raw = cast(bytes | None, r["payload_raw"])
+    payload: models.Payload
+    if raw is not None:
+        payload = await codec.decode_async(raw, cast(str | None, r["payload_codec"]))
+    else:
+        payload = cast(models.JSON, json.loads(r["payload"]))  # pyright: ignore[reportAny]
     return models.Message(
         id=cast(models.MessageID, r["id"]),
         channel=cast(models.Channel, r["channel"]),
-        payload=cast(models.JSON, json.loads(r["payload"])),  # pyright: ignore[reportAny]
+        payload=payload,
         published_at=cast(datetime, r["published_at"]),
     )
+
+
+def _to_consumer_lag(r: Record) -> models.ConsumerLag:
+    published = cast(int, r["published"])
+    acked = cast(int, r["acked"])
+    return models.ConsumerLag(
+        channel=cast(models.Channel, r["channel"]),
+        consumer=cast(models.Consumer, r["consumer"]),
+        published=published,
+        acked=acked,
+        unread=max(0, published - acked),
+    )
@@ -1,8 +1,23 @@
-from .models import MessageID, Channel, Consumer, Message
+from .models import (
+    Channel,
+    Consumer,
+    ConsumerLag,
+    Deadline,
+    DuplicateIdempotencyKey,
+    Message,
+    MessageID,
+    Payload,
+    PayloadModeMismatch,
+)
 
 __all__ = [
     "Message",
     "MessageID",
     "Channel",
     "Consumer",
+    "ConsumerLag",
+    "Deadline",
+    "DuplicateIdempotencyKey",
+    "Payload",
+    "PayloadModeMismatch",
 ]
@@ -1,17 +1,56 @@
 from dataclasses import dataclass
 from datetime import datetime
+import time
 from typing import Any, NewType, TypeAlias
 from uuid import UUID
 
 JSON: TypeAlias = dict[str, Any]
+Payload: TypeAlias = JSON | bytes  # bytes only on channels in raw payload mode
 Channel = NewType("Channel", str)
 Consumer = NewType("Consumer", str)
 MessageID = NewType("MessageID", UUID)
 
 
+@dataclass(frozen=True)
+class Deadline:
+    expires_at: float  # time.monotonic() clock
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() == 0.0
+
+
+class PayloadModeMismatch(Exception):
+    """A JSON payload was sent to a raw channel, or raw bytes to a JSON channel."""
+
+
+class DuplicateIdempotencyKey(Exception):
+    """Another publish with the same idempotency key won a race; `id` is its message."""
+
+    def __init__(self, id: MessageID) -> None:
+        super().__init__(f"message {id} was already published with this idempotency key")
+        self.id: MessageID = id
+
+
 @dataclass
 class Message:
     id: MessageID
     channel: Channel
-    payload: JSON
+    payload: Payload
     published_at: datetime
+
+
+@dataclass
+class ConsumerLag:
+    channel: Channel
+    consumer: Consumer
+    published: int
+    acked: int
+    unread: int
@@ -0,0 +1,97 @@
+from collections.abc import Mapping
+from datetime import UTC, datetime
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import random
+
+# attributes every LogRecord has; anything else on a record came in through `extra`
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class Sampler:
+    """Per-event sampling rates, e.g. {"publish.ok": 0.01} keeps roughly 1% of publish.ok.
+
+    Events without a rate are always kept, and so is anything at WARNING or above.
+    """
+
+    def __init__(self, rates: Mapping[str, float] | None = None) -> None:
+        self._rates: dict[str, float] = dict(rates or {})
+
+    @classmethod
+    def parse(cls, spec: str) -> "Sampler":
+        """Build from "event=rate,event=rate", the format of LOG_SAMPLE_RATES."""
+        rates: dict[str, float] = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            event, _, rate = item.partition("=")
+            rates[event.strip()] = float(rate)
+        return cls(rates)
+
+    def keep(self, level: int, event: str) -> bool:
+        if level >= logging.WARNING:
+            return True
+        rate = self._rates.get(event)
+        return rate is None or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the event name and all `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, object] = {
+            "ts": datetime.fromtimestamp(record.created, UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update((k, v) for k, v in vars(record).items() if k not in _RECORD_ATTRS)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _PassThroughQueueHandler(QueueHandler):
+    """Enqueues records untouched. The stock `prepare` formats the message on the
+    calling thread and strips `exc_info`, which would leave the traceback in `event`."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class QueueLogging:
+    """Handle for a logger routed through a queue by `start_queue_logging`."""
+
+    def __init__(self, logger: logging.Logger, handler: QueueHandler, listener: QueueListener) -> None:
+        self._logger: logging.Logger = logger
+        self._handler: QueueHandler = handler
+        self._listener: QueueListener = listener
+        self._propagate: bool = logger.propagate
+
+    def stop(self) -> None:
+        """Detach from the logger, then flush what is queued. Safe to call twice."""
+        if self._handler not in self._logger.handlers:
+            return
+        self._logger.removeHandler(self._handler)
+        self._logger.propagate = self._propagate
+        self._listener.stop()
+
+
+def start_queue_logging(logger: logging.Logger, handler: logging.Handler | None = None) -> QueueLogging:
+    """Route `logger` through an unbounded queue drained by a background thread.
+
+    The caller only enqueues records; formatting and I/O happen on the listener
+    thread. Nothing is dropped as long as the returned handle is stopped on
+    shutdown, which flushes the queue and detaches the logger from it.
+    """
+    if handler is None:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    queue_handler = _PassThroughQueueHandler(records)
+    listener = QueueListener(records, handler, respect_handler_level=True)
+    listener.start()
+    queue_logging = QueueLogging(logger, queue_handler, listener)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+    return queue_logging
@@ -0,0 +1,147 @@
+import asyncio
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Sequence
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+import enum
+import time
+
+from messaging.domain import models
+
+
+class Operation(enum.Enum):
+    PUBLISH = "publish"
+    READ = "read"
+    ACK = "ack"
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of being queued."""
+
+    def __init__(self, reason: str, retry_after: float) -> None:
+        super().__init__(reason)
+        self.retry_after: float = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the client-supplied deadline runs out."""
+
+
+@dataclass(frozen=True)
+class Limits:
+    # defaults add up to the default pool size so admitted requests never wait for a connection
+    max_publish: int = 2
+    max_read: int = 2
+    max_ack: int = 1
+    queue_wait: float = 0.5  # seconds a request may wait for a slot before being shed
+    retry_after: float = 1.0
+    channel_rate: float | None = None  # tokens per second per channel, None disables rate limiting
+    channel_burst: int = 100
+    max_tracked_channels: int = 10_000
+
+    def __post_init__(self) -> None:
+        if min(self.max_publish, self.max_read, self.max_ack) < 1:
+            raise ValueError("concurrency limits must be at least 1")
+        if self.channel_rate is not None and self.channel_rate <= 0:
+            raise ValueError("channel_rate must be positive, leave it unset to disable rate limiting")
+        if self.channel_burst < 1:
+            raise ValueError("channel_burst must be at least 1")
+
+    @property
+    def max_in_flight(self) -> int:
+        return self.max_publish + self.max_read + self.max_ack
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int) -> None:
+        self._rate: float = rate
+        self._burst: float = float(burst)
+        self._tokens: float = float(burst)
+        self._updated: float = time.monotonic()
+
+    def wait(self) -> float:
+        """Seconds until a token is available, 0 if one is available now."""
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        return max(0.0, (1.0 - self._tokens) / self._rate)
+
+    def take(self) -> None:
+        """Take the token that `wait` just reported as available."""
+        self._tokens -= 1.0
+
+
+class AdmissionController:
+    def __init__(self, limits: Limits | None = None) -> None:
+        self.limits: Limits = limits or Limits()
+        self._slots: dict[Operation, asyncio.Semaphore] = {
+            Operation.PUBLISH: asyncio.Semaphore(self.limits.max_publish),
+            Operation.READ: asyncio.Semaphore(self.limits.max_read),
+            Operation.ACK: asyncio.Semaphore(self.limits.max_ack),
+        }
+        self._buckets: OrderedDict[models.Channel, TokenBucket] = OrderedDict()
+
+    @asynccontextmanager
+    async def admit(
+        self,
+        op: Operation,
+        channels: Sequence[models.Channel] = (),
+        deadline: models.Deadline | None = None,
+    ) -> AsyncIterator[None]:
+        """Hold a concurrency slot for `op`.
+
+        Timeouts raised inside the block are reported as `DeadlineExceeded` when a
+        deadline was supplied.
+        """
+        if deadline is not None and deadline.expired:
+            raise DeadlineExceeded("deadline expired before admission")
+        self._throttle(channels)
+
+        slot = self._slots[op]
+        await self._acquire(op, slot, deadline)
+        try:
+            yield
+        except TimeoutError as e:
+            if deadline is None:
+                raise
+            raise DeadlineExceeded(f"{op.value} did not finish before the deadline") from e
+        finally:
+            slot.release()
+
+    async def _acquire(self, op: Operation, slot: asyncio.Semaphore, deadline: models.Deadline | None) -> None:
+        if not slot.locked():
+            await slot.acquire()
+            return
+        wait = self.limits.queue_wait
+        if deadline is not None:
+            wait = min(wait, deadline.remaining())
+        try:
+            async with asyncio.timeout(wait):
+                await slot.acquire()
+        except TimeoutError:
+            if deadline is not None and deadline.expired:
+                raise DeadlineExceeded(f"deadline expired waiting for a {op.value} slot") from None
+            raise Overloaded(f"too many concurrent {op.value} requests", self.limits.retry_after) from None
+
+    def _throttle(self, channels: Sequence[models.Channel]) -> None:
+        """Take a token from every channel, or from none of them if any channel is out."""
+        if self.limits.channel_rate is None:
+            return
+        buckets = {channel: self._bucket(channel, self.limits.channel_rate) for channel in channels}
+        waits = {channel: bucket.wait() for channel, bucket in buckets.items()}
+        channel = max(waits, key=waits.__getitem__, default=None)
+        if channel is not None and waits[channel] > 0:
+            raise Overloaded(f"rate limit exceeded for channel {channel}", waits[channel])
+        for bucket in buckets.values():
+            bucket.take()
+
+    def _bucket(self, channel: models.Channel, rate: float) -> TokenBucket:
+        bucket = self._buckets.get(channel)
+        if bucket is None:
+            bucket = TokenBucket(rate, self.limits.channel_burst)
+            self._buckets[channel] = bucket
+            if len(self._buckets) > self.limits.max_tracked_channels:
+                _ = self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(channel)
+        return bucket
@@ -7,18 +7,36 @@ from messaging.domain import models
 @dataclass(frozen=True)
 class Publish:
     message: models.Message
+    deadline: models.Deadline | None = None
+    idempotency_key: str | None = None
+
+
+@dataclass(frozen=True)
+class PublishFanOut:
+    # one message per target channel, all sharing the same payload and published_at
+    messages: list[models.Message]
+    deadline: models.Deadline | None = None
+
+
+@dataclass(frozen=True)
+class SetPayloadMode:
+    channel: models.Channel
+    raw: bool
+    deadline: models.Deadline | None = None
 
 
 @dataclass(frozen=True)
 class ListUnread:
     channel: models.Channel
     consumer: models.Consumer
+    deadline: models.Deadline | None = None
 
 
 @dataclass(frozen=True)
 class ListFromSequence:
     channel: models.Channel
     from_seq: int
+    deadline: models.Deadline | None = None
 
 
 @dataclass(frozen=True)
@@ -26,3 +44,17 @@ class Ack:
     id: models.MessageID
     consumer: models.Consumer
     read_at: datetime
+    deadline: models.Deadline | None = None
+
+
+@dataclass(frozen=True)
+class GetConsumerLag:
+    channel: models.Channel
+    consumer: models.Consumer
+    deadline: models.Deadline | None = None
+
+
+@dataclass(frozen=True)
+class ListConsumerLag:
+    channel: models.Channel
+    deadline: models.Deadline | None = None
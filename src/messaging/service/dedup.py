@@ -0,0 +1,27 @@
+from collections import OrderedDict
+
+from messaging.domain import models
+
+
+class DedupWindow:
+    """Bounded LRU of recently published (channel, idempotency key) -> message id.
+
+    Lets a retry that lands on the same process return the original id without
+    touching the database. The unique index on messages stays the source of truth.
+    """
+
+    def __init__(self, size: int = 10_000) -> None:
+        self._size: int = size
+        self._ids: OrderedDict[tuple[models.Channel, str], models.MessageID] = OrderedDict()
+
+    def get(self, channel: models.Channel, key: str) -> models.MessageID | None:
+        message_id = self._ids.get((channel, key))
+        if message_id is not None:
+            self._ids.move_to_end((channel, key))
+        return message_id
+
+    def put(self, channel: models.Channel, key: str, message_id: models.MessageID) -> None:
+        self._ids[(channel, key)] = message_id
+        self._ids.move_to_end((channel, key))
+        if len(self._ids) > self._size:
+            _ = self._ids.popitem(last=False)
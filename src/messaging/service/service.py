@@ -1,49 +1,116 @@
 from collections.abc import Mapping
 import logging
 
+from messaging import log
 from messaging.adapters import repository
 from messaging.domain import models
 
-from . import commands
+from . import admission, commands, dedup
 
 
 class Service:
-    def __init__(self, pg: repository.PostgresManager, logger: logging.Logger) -> None:
+    def __init__(
+        self,
+        pg: repository.PostgresManager,
+        logger: logging.Logger,
+        admission_control: admission.AdmissionController | None = None,
+        dedup_window: dedup.DedupWindow | None = None,
+        sampler: log.Sampler | None = None,
+    ) -> None:
         self.pg: repository.PostgresManager = pg
         self.logger: logging.Logger = logger
+        self.admission: admission.AdmissionController = admission_control or admission.AdmissionController()
+        self.dedup: dedup.DedupWindow = dedup_window or dedup.DedupWindow()
+        self.sampler: log.Sampler = sampler or log.Sampler()
 
-    def log_with(self, extra: Mapping[str, object]) -> logging.LoggerAdapter[logging.Logger]:
-        return logging.LoggerAdapter(self.logger, extra=extra, merge_extra=True)
+    def log(self, level: int, event: str, fields: Mapping[str, object]) -> None:
+        if self.logger.isEnabledFor(level) and self.sampler.keep(level, event):
+            self.logger.log(level, event, extra=fields)
 
     async def publish(self, cmd: commands.Publish) -> models.MessageID:
-        log = self.log_with({"message_id": cmd.message.id, "channel": cmd.message.channel})
-        log.info("publish.start")
-        async with self.pg.transaction() as tx:
-            new_id = await tx.add(cmd.message)
-            await tx.commit()
-        log.info("publish.ok", extra={"new_id": new_id})
+        channel, key = cmd.message.channel, cmd.idempotency_key
+        if key is not None and (seen := self.dedup.get(channel, key)) is not None:
+            self.log(
+                logging.INFO, "publish.duplicate", {"message_id": cmd.message.id, "channel": channel, "new_id": seen}
+            )
+            return seen
+        self.log(logging.INFO, "publish.start", {"message_id": cmd.message.id, "channel": channel})
+        try:
+            async with self.admission.admit(admission.Operation.PUBLISH, (channel,), cmd.deadline):
+                async with self.pg.transaction(cmd.deadline) as tx:
+                    new_id = await tx.add(cmd.message, key)
+                    await tx.commit()
+        except models.DuplicateIdempotencyKey as e:
+            new_id = e.id
+        if key is not None:
+            self.dedup.put(channel, key, new_id)
+        self.log(logging.INFO, "publish.ok", {"message_id": cmd.message.id, "channel": channel, "new_id": new_id})
         return new_id
 
+    async def publish_fanout(self, cmd: commands.PublishFanOut) -> list[models.MessageID]:
+        channels = [m.channel for m in cmd.messages]
+        self.log(logging.INFO, "publish_fanout.start", {"channels": channels})
+        async with self.admission.admit(admission.Operation.PUBLISH, channels, cmd.deadline):
+            async with self.pg.transaction(cmd.deadline) as tx:
+                new_ids = await tx.add_fanout(cmd.messages)
+                await tx.commit()
+        self.log(logging.INFO, "publish_fanout.ok", {"channels": channels, "new_ids": new_ids})
+        return new_ids
+
+    async def set_payload_mode(self, cmd: commands.SetPayloadMode) -> None:
+        self.log(logging.INFO, "set_payload_mode.start", {"channel": cmd.channel, "raw": cmd.raw})
+        async with self.admission.admit(admission.Operation.PUBLISH, (cmd.channel,), cmd.deadline):
+            async with self.pg.transaction(cmd.deadline) as tx:
+                await tx.set_payload_mode(cmd.channel, cmd.raw)
+                await tx.commit()
+        self.log(logging.INFO, "set_payload_mode.ok", {"channel": cmd.channel, "raw": cmd.raw})
+
     async def list_unread(self, cmd: commands.ListUnread) -> list[models.Message]:
-        log = self.log_with({"channel": cmd.channel, "consumer": cmd.consumer})
-        log.debug("list_unread.start")
-        async with self.pg.transaction() as tx:
-            messages = await tx.list_unread(cmd.channel, cmd.consumer)
-        log.debug("list_unread.ok", extra={"count": len(messages)})
+        self.log(logging.DEBUG, "list_unread.start", {"channel": cmd.channel, "consumer": cmd.consumer})
+        async with self.admission.admit(admission.Operation.READ, (cmd.channel,), cmd.deadline):
+            async with self.pg.transaction(cmd.deadline) as tx:
+                messages = await tx.list_unread(cmd.channel, cmd.consumer)
+                await tx.commit()
+        self.log(
+            logging.DEBUG, "list_unread.ok", {"channel": cmd.channel, "consumer": cmd.consumer, "count": len(messages)}
+        )
         return messages
 
     async def list_from_sequence(self, cmd: commands.ListFromSequence) -> list[models.Message]:
-        log = self.log_with({"channel": cmd.channel, "from_sequence": cmd.from_seq})
-        log.debug("list_from_sequence.start")
-        async with self.pg.transaction() as tx:
-            messages = await tx.list_from_sequence(cmd.channel, cmd.from_seq)
-        log.debug("list_from_sequence.ok", extra={"count": len(messages)})
+        self.log(logging.DEBUG, "list_from_sequence.start", {"channel": cmd.channel, "from_sequence": cmd.from_seq})
+        async with self.admission.admit(admission.Operation.READ, (cmd.channel,), cmd.deadline):
+            async with self.pg.transaction(cmd.deadline) as tx:
+                messages = await tx.list_from_sequence(cmd.channel, cmd.from_seq)
+        self.log(
+            logging.DEBUG,
+            "list_from_sequence.ok",
+            {"channel": cmd.channel, "from_sequence": cmd.from_seq, "count": len(messages)},
+        )
         return messages
 
     async def ack(self, cmd: commands.Ack) -> None:
-        log = self.log_with({"message_id": cmd.id, "consumer": cmd.consumer})
-        log.debug("ack.start")
-        async with self.pg.transaction() as tx:
-            await tx.mark_read(cmd.id, cmd.consumer, cmd.read_at)
-            await tx.commit()
-        log.debug("ack.ok")
+        self.log(logging.DEBUG, "ack.start", {"message_id": cmd.id, "consumer": cmd.consumer})
+        async with self.admission.admit(admission.Operation.ACK, deadline=cmd.deadline):
+            async with self.pg.transaction(cmd.deadline) as tx:
+                await tx.mark_read(cmd.id, cmd.consumer, cmd.read_at)
+                await tx.commit()
+        self.log(logging.DEBUG, "ack.ok", {"message_id": cmd.id, "consumer": cmd.consumer})
+
+    async def consumer_lag(self, cmd: commands.GetConsumerLag) -> models.ConsumerLag:
+        self.log(logging.DEBUG, "consumer_lag.start", {"channel": cmd.channel, "consumer": cmd.consumer})
+        # lag polls take a read slot but are not charged against the channel rate limit
+        async with self.admission.admit(admission.Operation.READ, deadline=cmd.deadline):
+            async with self.pg.transaction(cmd.deadline) as tx:
+                lag = await tx.consumer_lag(cmd.channel, cmd.consumer)
+        self.log(
+            logging.DEBUG, "consumer_lag.ok", {"channel": cmd.channel, "consumer": cmd.consumer, "unread": lag.unread}
+        )
+        return lag
+
+    async def list_consumer_lag(self, cmd: commands.ListConsumerLag) -> list[models.ConsumerLag]:
+        self.log(logging.DEBUG, "list_consumer_lag.start", {"channel": cmd.channel})
+        async with self.admission.admit(admission.Operation.READ, deadline=cmd.deadline):
+            async with self.pg.transaction(cmd.deadline) as tx:
+                lags = await tx.list_consumer_lag(cmd.channel)
+        self.log(logging.DEBUG, "list_consumer_lag.ok", {"channel": cmd.channel, "count": len(lags)})
+        return lags
@@ -7,7 +7,13 @@ from . import helpers
 
 
 class AppFixture:
-    def __init__(self, service: Service, pool: asyncpg.Pool, client: httpx.AsyncClient):
+    def __init__(self, service: Service, pool: asyncpg.Pool, client: httpx.AsyncClient, dsn: str, schema: str):
         self.service: Service = service
         self.pool: asyncpg.Pool = pool
         self.http: helpers.HttpClient = helpers.HttpClient(client)
+        self._dsn: str = dsn
+        self._schema: str = schema
+
+    async def connect(self) -> asyncpg.Connection:
+        """A connection to the app's schema outside of its pool, e.g. to hold locks."""
+        return await asyncpg.connect(self._dsn, server_settings={"search_path": self._schema})
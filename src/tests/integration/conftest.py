@@ -2,7 +2,6 @@ import asyncio
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 import logging
-import pathlib
 import uuid
 
 import asyncpg
@@ -16,25 +15,12 @@ from messaging.adapters import repository
 from messaging.adapters.http.handlers import app as http_app
 from messaging.service.service import Service
 
+from ..migrations import apply_migrations
 from .app_fixture import AppFixture
 
-MIGRATIONS_DIR = pathlib.Path(repository.__file__).parent / "migrations"
 pytestmark = pytest.mark.asyncio
 
 
-async def _apply_migrations(dsn: str, schema: str) -> None:
-    conn = await asyncpg.connect(dsn=dsn)
-    try:
-        _ = await conn.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
-        for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
-            sql = path.read_text(encoding="utf-8")
-            async with conn.transaction():
-                _ = await conn.execute(f'SET LOCAL search_path TO "{schema}"')
-                _ = await conn.execute(sql)
-    finally:
-        await conn.close()
-
-
 def _pick_free_port() -> int:
     import socket as _s
 
@@ -46,7 +32,7 @@ def _pick_free_port() -> int:
 @pytest_asyncio.fixture
 async def app(pg_dsn: str) -> AsyncIterator[AppFixture]:
     schema = f"t_{uuid.uuid4().hex[:8]}"
-    await _apply_migrations(pg_dsn, schema)
+    await apply_migrations(pg_dsn, schema)
 
     pool: asyncpg.Pool = await asyncpg.create_pool(
         dsn=pg_dsn,
@@ -72,7 +58,7 @@ async def app(pg_dsn: str) -> AsyncIterator[AppFixture]:
 
     client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=10.0)
     try:
-        yield AppFixture(service, pool, client)
+        yield AppFixture(service, pool, client, pg_dsn, schema)
     finally:
         server.should_exit = True
         await task
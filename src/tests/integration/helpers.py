@@ -1,3 +1,4 @@
+from collections.abc import AsyncIterable
 from typing import Literal
 
 import httpx
@@ -19,18 +20,49 @@ class HttpClient:
         path: URL,
         *,
         json: models.JSON | None = None,
+        content: bytes | AsyncIterable[bytes] | None = None,
         headers: dict[str, str] | None = None,
     ) -> httpx.Response:
-        return await self._client.request(method, path, json=json, headers=headers)
+        return await self._client.request(method, path, json=json, content=content, headers=headers)
 
-    async def publish(self, ch: models.Channel, payload: models.JSON) -> models.MessageID:
+    async def publish(
+        self, ch: models.Channel, payload: models.JSON, *, idempotency_key: str | None = None
+    ) -> models.MessageID:
         resp = await self.request(
             "POST",
             URL(f"/channels/{ch}/publish"),
             json=schema.PublishRequest(payload=payload).model_dump(),
+            headers=None if idempotency_key is None else {"Idempotency-Key": idempotency_key},
         )
         return schema.PublishResponse.model_validate_json(resp.text).id
 
+    async def publish_raw(self, ch: models.Channel, payload: bytes) -> models.MessageID:
+        resp = await self.request(
+            "POST",
+            URL(f"/channels/{ch}/publish/raw"),
+            content=payload,
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        return schema.PublishResponse.model_validate_json(resp.text).id
+
+    async def set_payload_mode(self, ch: models.Channel, raw: bool) -> None:
+        resp = await self.request(
+            "PUT",
+            URL(f"/channels/{ch}/payload-mode"),
+            json=schema.PayloadModeRequest(raw=raw).model_dump(),
+        )
+        assert resp.status_code == 204, resp.text
+
+    async def publish_fanout(
+        self, chs: list[models.Channel], payload: models.JSON
+    ) -> dict[models.Channel, models.MessageID]:
+        resp = await self.request(
+            "POST",
+            URL("/channels/publish"),
+            json=schema.PublishFanOutRequest(channels=chs, payload=payload).model_dump(),
+        )
+        return schema.PublishFanOutResponse.model_validate_json(resp.text).ids
+
     async def list_unread(self, ch: models.Channel, con: models.Consumer) -> list[models.Message]:
         resp = await self.request(
             "GET",
@@ -54,6 +86,14 @@ class HttpClient:
         )
         assert resp.status_code in (200, 204), resp.text
 
+    async def consumer_lag(self, ch: models.Channel, con: models.Consumer) -> models.ConsumerLag:
+        resp = await self.request("GET", URL(f"/channels/{ch}/consumers/{con}/lag"))
+        return schema.GetConsumerLagResponse.model_validate_json(resp.text).lag
+
+    async def list_consumer_lag(self, ch: models.Channel) -> list[models.ConsumerLag]:
+        resp = await self.request("GET", URL(f"/channels/{ch}/consumers/lag"))
+        return schema.ListConsumerLagResponse.model_validate_json(resp.text).consumers
+
 
 def expect_message_equal_ignoring_time(*, actual: models.Message, expected: models.Message) -> None:
     aligned_expected = models.Message(
@@ -0,0 +1,171 @@
+import time
+
+from httpx import URL
+import pytest
+
+from messaging.adapters.http import schema
+from messaging.domain import models
+from messaging.service import admission
+
+from .app_fixture import AppFixture
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_admission__503_with_retry_after_when_channel_rate_limited(app: AppFixture):
+    # Given: one token per channel that refills very slowly
+    app.service.admission = admission.AdmissionController(admission.Limits(channel_rate=0.01, channel_burst=1))
+    noisy = models.Channel("noisy")
+    quiet = models.Channel("quiet")
+    body = schema.PublishRequest(payload={"k": "v"}).model_dump()
+
+    # When
+    first = await app.http.request("POST", URL(f"/channels/{noisy}/publish"), json=body)
+    second = await app.http.request("POST", URL(f"/channels/{noisy}/publish"), json=body)
+    other = await app.http.request("POST", URL(f"/channels/{quiet}/publish"), json=body)
+
+    # Then: the noisy channel is shed, the quiet one is unaffected
+    assert first.status_code == 201, first.text
+    assert second.status_code == 503, second.text
+    assert int(second.headers["Retry-After"]) >= 1
+    assert other.status_code == 201, other.text
+
+
+async def test_admission__503_when_no_slot_frees_up_within_queue_wait(app: AppFixture):
+    # Given: a single publish slot which we hold ourselves
+    app.service.admission = admission.AdmissionController(admission.Limits(max_publish=1, queue_wait=0.05))
+    channel = models.Channel("orders")
+    body = schema.PublishRequest(payload={"k": "v"}).model_dump()
+
+    # When
+    async with app.service.admission.admit(admission.Operation.PUBLISH):
+        resp = await app.http.request("POST", URL(f"/channels/{channel}/publish"), json=body)
+
+    # Then
+    assert resp.status_code == 503, resp.text
+    assert "Retry-After" in resp.headers
+
+    ## reads have their own slots and are not affected
+    assert await app.http.list_from_sequence(channel, 0) == []
+
+
+async def test_admission__504_when_client_deadline_already_expired(app: AppFixture):
+    # Given
+    channel = models.Channel("orders")
+
+    # When
+    resp = await app.http.request(
+        "GET",
+        URL(f"/channels/{channel}/messages/from/0"),
+        headers={"X-Request-Timeout-Ms": "0"},
+    )
+
+    # Then
+    assert resp.status_code == 504, resp.text
+
+
+async def test_admission__504_when_statement_outlives_client_deadline(app: AppFixture):
+    # Given: the channel's sequence row is locked by another transaction, so a publish blocks
+    channel = models.Channel("orders")
+    first = await app.http.publish(channel, {"k": "v"})
+    body = schema.PublishRequest(payload={"k": "v"}).model_dump()
+    conn = await app.connect()
+    try:
+        async with conn.transaction():
+            _ = await conn.execute("SELECT 1 FROM channel_sequences WHERE channel = $1 FOR UPDATE", channel)
+
+            # When
+            started = time.monotonic()
+            resp = await app.http.request(
+                "POST",
+                URL(f"/channels/{channel}/publish"),
+                json=body,
+                headers={"X-Request-Timeout-Ms": "200"},
+            )
+            elapsed = time.monotonic() - started
+    finally:
+        await conn.close()
+
+    # Then
+    assert resp.status_code == 504, resp.text
+    assert elapsed < 2.0
+
+    ## the blocked publish was rolled back and the connection is usable again
+    assert [m.id for m in await app.http.list_from_sequence(channel, 0)] == [first]
+
+
+async def test_admission__200_within_client_deadline(app: AppFixture):
+    # Given
+    channel = models.Channel("orders")
+    message_id = await app.http.publish(channel, {"k": "v"})
+
+    # When
+    resp = await app.http.request(
+        "GET",
+        URL(f"/channels/{channel}/messages/from/0"),
+        headers={"X-Request-Timeout-Ms": "5000"},
+    )
+
+    # Then
+    assert resp.status_code == 200, resp.text
+    assert [m.id for m in schema.GetMessagesResponse.model_validate_json(resp.text).messages] == [message_id]
+
+
+async def test_admission__422_when_timeout_header_is_negative(app: AppFixture):
+    # Given
+    channel = models.Channel("orders")
+
+    # When
+    resp = await app.http.request(
+        "GET",
+        URL(f"/channels/{channel}/messages/from/0"),
+        headers={"X-Request-Timeout-Ms": "-1"},
+    )
+
+    # Then
+    assert resp.status_code == 422, resp.text
+
+
+@pytest.mark.parametrize("timeout_ms", [str(schema.MAX_REQUEST_TIMEOUT_MS + 1), "1" * 401])
+async def test_admission__422_when_timeout_header_is_too_large(app: AppFixture, timeout_ms: str):
+    # Given
+    channel = models.Channel("orders")
+
+    # When
+    resp = await app.http.request(
+        "GET",
+        URL(f"/channels/{channel}/messages/from/0"),
+        headers={"X-Request-Timeout-Ms": timeout_ms},
+    )
+
+    # Then
+    assert resp.status_code == 422, resp.text
+
+
+async def test_admission__200_with_largest_timeout_header(app: AppFixture):
+    # Given
+    channel = models.Channel("orders")
+
+    # When
+    resp = await app.http.request(
+        "GET",
+        URL(f"/channels/{channel}/messages/from/0"),
+        headers={"X-Request-Timeout-Ms": str(schema.MAX_REQUEST_TIMEOUT_MS)},
+    )
+
+    # Then
+    assert resp.status_code == 200, resp.text
+
+
+@pytest.mark.parametrize(
+    "limits",
+    [
+        {"channel_rate": 0.0},
+        {"channel_rate": -1.0},
+        {"channel_rate": 1.0, "channel_burst": 0},
+        {"max_publish": 0},
+    ],
+)
+async def test_admission__limits_reject_values_that_cannot_admit_anything(limits: dict[str, float]):
+    with pytest.raises(ValueError):
+        _ = admission.Limits(**limits)  # pyright: ignore[reportArgumentType]
@@ -0,0 +1,106 @@
+import pytest
+
+from messaging.domain import models
+from messaging.service import admission
+
+from .app_fixture import AppFixture
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_consumer_lag__counts_unacked_messages(app: AppFixture):
+    # Given
+    channel = models.Channel("orders")
+    consumer = models.Consumer("reporting")
+    ids = [await app.http.publish(channel, {"i": i}) for i in range(3)]
+
+    # When
+    await app.http.ack(ids[0], consumer)
+    lag = await app.http.consumer_lag(channel, consumer)
+
+    # Then
+    assert lag == models.ConsumerLag(channel=channel, consumer=consumer, published=3, acked=1, unread=2)
+
+
+async def test_consumer_lag__repeated_ack_is_counted_once(app: AppFixture):
+    # Given
+    channel = models.Channel("orders")
+    consumer = models.Consumer("reporting")
+    message_id = await app.http.publish(channel, {"k": "v"})
+
+    # When
+    await app.http.ack(message_id, consumer)
+    await app.http.ack(message_id, consumer)
+    lag = await app.http.consumer_lag(channel, consumer)
+
+    # Then
+    assert (lag.acked, lag.unread) == (1, 0)
+
+
+async def test_consumer_lag__unknown_consumer_and_channel(app: AppFixture):
+    # Given
+    channel = models.Channel("orders")
+    _ = await app.http.publish(channel, {"k": "v"})
+
+    # When
+    never_acked = await app.http.consumer_lag(channel, models.Consumer("new"))
+    empty = await app.http.consumer_lag(models.Channel("nothing-here"), models.Consumer("new"))
+
+    # Then
+    assert (never_acked.published, never_acked.acked, never_acked.unread) == (1, 0, 1)
+    assert (empty.published, empty.acked, empty.unread) == (0, 0, 0)
+
+
+async def test_list_consumer_lag__per_consumer_on_that_channel_only(app: AppFixture):
+    # Given
+    channel = models.Channel("orders")
+    other = models.Channel("invoices")
+    alpha = models.Consumer("alpha")
+    beta = models.Consumer("beta")
+    ids = [await app.http.publish(channel, {"i": i}) for i in range(4)]
+    other_id = await app.http.publish(other, {"k": "v"})
+
+    # When
+    for message_id in ids[:3]:
+        await app.http.ack(message_id, alpha)
+    await app.http.ack(ids[0], beta)
+    await app.http.ack(other_id, beta)
+    lags = await app.http.list_consumer_lag(channel)
+
+    # Then
+    assert lags == [
+        models.ConsumerLag(channel=channel, consumer=alpha, published=4, acked=3, unread=1),
+        models.ConsumerLag(channel=channel, consumer=beta, published=4, acked=1, unread=3),
+    ]
+
+
+async def test_list_consumer_lag__includes_consumers_that_read_but_never_ack(app: AppFixture):
+    # Given
+    channel = models.Channel("orders")
+    stuck = models.Consumer("stuck")
+    _ = [await app.http.publish(channel, {"i": i}) for i in range(2)]
+
+    # When
+    unread = await app.http.list_unread(channel, stuck)
+    _ = await app.http.list_unread(channel, stuck)
+    lags = await app.http.list_consumer_lag(channel)
+
+    # Then
+    assert len(unread) == 2
+    assert lags == [models.ConsumerLag(channel=channel, consumer=stuck, published=2, acked=0, unread=2)]
+
+
+async def test_consumer_lag__polls_are_not_channel_rate_limited(app: AppFixture):
+    # Given: a channel whose single token is spent by the publish
+    app.service.admission = admission.AdmissionController(admission.Limits(channel_rate=0.01, channel_burst=1))
+    channel = models.Channel("orders")
+    consumer = models.Consumer("reporting")
+    _ = await app.http.publish(channel, {"k": "v"})
+
+    # When
+    lags = [await app.http.consumer_lag(channel, consumer) for _ in range(3)]
+    listed = await app.http.list_consumer_lag(channel)
+
+    # Then
+    assert [lag.unread for lag in lags] == [1, 1, 1]
+    assert listed == []
@@ -0,0 +1,91 @@
+from httpx import URL
+import pytest
+
+from messaging.adapters.http import schema
+from messaging.domain import models
+from messaging.service import dedup
+
+from .app_fixture import AppFixture
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_idempotent_publish__retry_returns_original_id(app: AppFixture):
+    # Given
+    channel = models.Channel("orders")
+    first = await app.http.publish(channel, {"k": "v"}, idempotency_key="order-1001")
+
+    # When
+    retry = await app.http.publish(channel, {"k": "v"}, idempotency_key="order-1001")
+
+    # Then
+    assert retry == first
+    assert [m.id for m in await app.http.list_from_sequence(channel, 0)] == [first]
+
+
+async def test_idempotent_publish__retry_after_dedup_window_hits_database(app: AppFixture):
+    # Given: the in-process window has forgotten the key, e.g. the retry hit another instance
+    channel = models.Channel("orders")
+    first = await app.http.publish(channel, {"k": "v"}, idempotency_key="order-1001")
+    app.service.dedup = dedup.DedupWindow()
+
+    # When
+    retry = await app.http.publish(channel, {"k": "v"}, idempotency_key="order-1001")
+    after = await app.http.publish(channel, {"k": "v2"})
+
+    # Then: no duplicate and no gap in the channel sequence
+    assert retry == first
+    assert [m.id for m in await app.http.list_from_sequence(channel, 0)] == [first, after]
+    assert [m.id for m in await app.http.list_from_sequence(channel, 1)] == [after]
+    assert (await app.http.consumer_lag(channel, models.Consumer("c"))).published == 2
+
+
+async def test_idempotent_publish__keys_are_scoped_per_channel(app: AppFixture):
+    # When
+    a = await app.http.publish(models.Channel("orders"), {"k": "v"}, idempotency_key="same")
+    b = await app.http.publish(models.Channel("invoices"), {"k": "v"}, idempotency_key="same")
+
+    # Then
+    assert a != b
+
+
+async def test_idempotent_publish__without_key_publishes_every_time(app: AppFixture):
+    # Given
+    channel = models.Channel("orders")
+
+    # When
+    ids = [await app.http.publish(channel, {"k": "v"}) for _ in range(2)]
+
+    # Then
+    assert ids[0] != ids[1]
+    assert len(await app.http.list_from_sequence(channel, 0)) == 2
+
+
+async def test_idempotent_publish__422_when_key_too_long(app: AppFixture):
+    # When
+    resp = await app.http.request(
+        "POST",
+        URL("/channels/orders/publish"),
+        json={"payload": {"k": "v"}},
+        headers={"Idempotency-Key": "k" * 256},
+    )
+
+    # Then
+    assert resp.status_code == 422, resp.text
+
+
+async def test_idempotent_publish__400_when_key_sent_to_fanout(app: AppFixture):
+    # Given
+    channel = models.Channel("orders")
+
+    # When
+    resp = await app.http.request(
+        "POST",
+        URL("/channels/publish"),
+        json=schema.PublishFanOutRequest(channels=[channel], payload={"k": "v"}).model_dump(),
+        headers={"Idempotency-Key": "order-1001"},
+    )
+
+    # Then
+    assert resp.status_code == 400, resp.text
+    assert await app.http.list_from_sequence(channel, 0) == []
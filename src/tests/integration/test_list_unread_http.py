@@ -76,3 +76,32 @@ async def test_unread__400_without_consumer_header(app: AppFixture):
     # Then
     assert resp.status_code == 400, resp.text
     assert resp.json()["detail"] == "X-Consumer header is required"
+
+
+async def test_list_unread__out_of_order_acks(app: AppFixture):
+    # Given
+    channel = models.Channel("orders")
+    consumer = models.Consumer("tester")
+    ids = [await app.http.publish(channel, {"i": i}) for i in range(5)]
+
+    # When: acks arrive out of order and leave a gap at ids[2]
+    for i in (1, 3, 0, 4):
+        await app.http.ack(ids[i], consumer)
+    unread_with_gap = await app.http.list_unread(channel, consumer)
+    await app.http.ack(ids[2], consumer)
+    unread_after_gap = await app.http.list_unread(channel, consumer)
+    later = await app.http.publish(channel, {"i": 5})
+    unread_after_publish = await app.http.list_unread(channel, consumer)
+
+    # Then
+    assert [m.id for m in unread_with_gap] == [ids[2]]
+    assert unread_after_gap == []
+    assert [m.id for m in unread_after_publish] == [later]
+
+    ## the watermark stopped at the gap, then moved past everything acked
+    assert (
+        await app.pool.fetchval(
+            "SELECT acked_through FROM consumer_acks WHERE channel = $1 AND consumer = $2", channel, consumer
+        )
+        == 4
+    )
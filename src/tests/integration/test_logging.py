@@ -0,0 +1,118 @@
+import json
+import logging
+
+import pytest
+
+from messaging import log
+from messaging.domain import models
+
+from .app_fixture import AppFixture
+
+pytestmark = pytest.mark.asyncio
+
+
+class _Collect(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.lines: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.lines.append(self.format(record))
+
+
+async def test_logging__sampled_out_events_are_not_emitted(app: AppFixture, caplog: pytest.LogCaptureFixture):
+    # Given
+    caplog.set_level(logging.DEBUG, logger=app.service.logger.name)
+    app.service.sampler = log.Sampler({"publish.start": 0.0, "publish.ok": 0.0})
+
+    # When
+    _ = await app.http.publish(models.Channel("orders"), {"k": "v"})
+    _ = await app.http.list_from_sequence(models.Channel("orders"), 0)
+
+    # Then
+    events = [r.getMessage() for r in caplog.records]
+    assert "publish.start" not in events
+    assert "publish.ok" not in events
+    assert "list_from_sequence.ok" in events
+
+
+async def test_logging__warnings_and_errors_are_never_sampled(app: AppFixture, caplog: pytest.LogCaptureFixture):
+    # Given
+    caplog.set_level(logging.DEBUG, logger=app.service.logger.name)
+    app.service.sampler = log.Sampler({"publish.failed": 0.0})
+
+    # When
+    app.service.log(logging.ERROR, "publish.failed", {"channel": "orders"})
+
+    # Then
+    assert [(r.levelno, r.getMessage()) for r in caplog.records] == [(logging.ERROR, "publish.failed")]
+
+
+async def test_logging__queue_listener_writes_structured_records():
+    # Given
+    logger = logging.getLogger("messaging.test.queue")
+    logger.setLevel(logging.INFO)
+    sink = _Collect()
+    sink.setFormatter(log.JsonFormatter())
+    queue_logging = log.start_queue_logging(logger, sink)
+
+    # When
+    logger.info("publish.ok", extra={"channel": "orders", "count": 3})
+    queue_logging.stop()  # drains the queue
+
+    # Then
+    [line] = sink.lines
+    entry = json.loads(line)
+    assert (entry["event"], entry["level"], entry["channel"], entry["count"]) == ("publish.ok", "INFO", "orders", 3)
+
+
+async def test_logging__queue_listener_keeps_exc_info_out_of_event():
+    # Given
+    logger = logging.getLogger("messaging.test.queue.exc")
+    logger.setLevel(logging.INFO)
+    sink = _Collect()
+    sink.setFormatter(log.JsonFormatter())
+    queue_logging = log.start_queue_logging(logger, sink)
+
+    # When
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        logger.error("publish.failed", exc_info=True, extra={"channel": "orders"})
+    queue_logging.stop()
+
+    # Then
+    [line] = sink.lines
+    entry = json.loads(line)
+    assert entry["event"] == "publish.failed"
+    assert entry["channel"] == "orders"
+    assert "RuntimeError: boom" in entry["exc_info"]
+
+
+async def test_logging__parse_sample_rates():
+    sampler = log.Sampler.parse("publish.start=0, publish.ok=1")
+    assert not sampler.keep(logging.INFO, "publish.start")
+    assert sampler.keep(logging.INFO, "publish.ok")
+    assert sampler.keep(logging.INFO, "ack.ok")
+    assert sampler.keep(logging.WARNING, "publish.start")
+
+
+async def test_logging__stop_detaches_the_queue_from_the_logger():
+    # Given: started twice, as when lifespan runs twice in one process
+    logger = logging.getLogger("messaging.test.queue.stop")
+    logger.setLevel(logging.INFO)
+    sink = _Collect()
+    sink.setFormatter(log.JsonFormatter())
+    log.start_queue_logging(logger, sink).stop()
+    queue_logging = log.start_queue_logging(logger, sink)
+
+    # When
+    logger.info("publish.ok")
+    queue_logging.stop()
+    queue_logging.stop()
+    logger.info("after.stop")
+
+    # Then: one record, and nothing left on the logger to enqueue into
+    assert [json.loads(line)["event"] for line in sink.lines] == ["publish.ok"]
+    assert logger.handlers == []
+    assert logger.propagate
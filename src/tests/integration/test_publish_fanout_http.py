@@ -0,0 +1,96 @@
+from datetime import datetime
+
+from httpx import URL
+import pytest
+
+from messaging.adapters.http import schema
+from messaging.domain import models
+from messaging.service import admission
+
+from . import helpers
+from .app_fixture import AppFixture
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_publish_fanout__201_one_message_per_channel(app: AppFixture):
+    # Given
+    orders = models.Channel("orders")
+    orders_eu = models.Channel("orders-eu")
+    payload: models.JSON = {"event": "order_picked"}
+
+    # When
+    ids = await app.http.publish_fanout([orders, orders_eu], payload)
+
+    # Then
+    assert list(ids) == [orders, orders_eu]
+    assert ids[orders] != ids[orders_eu]
+    for channel in (orders, orders_eu):
+        messages = await app.http.list_from_sequence(channel, 0)
+        assert [m.id for m in messages] == [ids[channel]]
+        helpers.expect_message_equal_ignoring_time(
+            actual=messages[0],
+            expected=models.Message(
+                id=ids[channel],
+                channel=channel,
+                payload=payload,
+                published_at=datetime.min,  # ignored by helper
+            ),
+        )
+
+
+async def test_publish_fanout__continues_each_channel_sequence(app: AppFixture):
+    # Given: orders already has two messages, orders-eu has none
+    orders = models.Channel("orders")
+    orders_eu = models.Channel("orders-eu")
+    existing = [await app.http.publish(orders, {"i": i}) for i in range(2)]
+
+    # When
+    ids = await app.http.publish_fanout([orders_eu, orders], {"i": 2})
+
+    # Then
+    assert [m.id for m in await app.http.list_from_sequence(orders, 2)] == [ids[orders]]
+    assert [m.id for m in await app.http.list_from_sequence(orders, 0)] == [*existing, ids[orders]]
+    assert [m.id for m in await app.http.list_from_sequence(orders_eu, 0)] == [ids[orders_eu]]
+
+
+async def test_publish_fanout__duplicate_channels_publish_once(app: AppFixture):
+    # Given
+    orders = models.Channel("orders")
+
+    # When
+    ids = await app.http.publish_fanout([orders, orders], {"k": "v"})
+
+    # Then
+    assert list(ids) == [orders]
+    assert len(await app.http.list_from_sequence(orders, 0)) == 1
+
+
+async def test_publish_fanout__422_without_channels(app: AppFixture):
+    # When
+    resp = await app.http.request("POST", URL("/channels/publish"), json={"channels": [], "payload": {"k": "v"}})
+
+    # Then
+    assert resp.status_code == 422, resp.text
+
+
+async def test_publish_fanout__rate_limited_fanout_spends_no_tokens(app: AppFixture):
+    # Given: one token per channel, already spent on invoices
+    app.service.admission = admission.AdmissionController(admission.Limits(channel_rate=0.01, channel_burst=1))
+    orders = models.Channel("orders")
+    invoices = models.Channel("invoices")
+    _ = await app.http.publish(invoices, {"k": "v"})
+
+    # When
+    resp = await app.http.request(
+        "POST",
+        URL("/channels/publish"),
+        json=schema.PublishFanOutRequest(channels=[orders, invoices], payload={"k": "v"}).model_dump(),
+    )
+
+    # Then: the fan-out is shed and orders keeps its token
+    assert resp.status_code == 503, resp.text
+    retry = await app.http.request(
+        "POST", URL(f"/channels/{orders}/publish"), json=schema.PublishRequest(payload={"k": "v"}).model_dump()
+    )
+    assert retry.status_code == 201, retry.text
@@ -0,0 +1,120 @@
+from collections.abc import AsyncIterator
+import os
+
+from httpx import URL
+import pytest
+
+from messaging.adapters.http import schema
+from messaging.adapters.repository import codec
+from messaging.domain import models
+
+from .app_fixture import AppFixture
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_raw_payload__roundtrip_small_and_large(app: AppFixture):
+    # Given
+    channel = models.Channel("blobs")
+    small = os.urandom(16)
+    large = b"compressible " * 1000
+    await app.http.set_payload_mode(channel, raw=True)
+
+    # When
+    ids = [await app.http.publish_raw(channel, p) for p in (small, large)]
+    messages = await app.http.list_from_sequence(channel, 0)
+
+    # Then
+    assert [m.id for m in messages] == ids
+    assert [m.payload for m in messages] == [small, large]
+
+    ## only the large one is stored compressed
+    rows = await app.pool.fetch("SELECT payload_codec FROM messages WHERE channel = $1 ORDER BY seq", channel)
+    assert [r["payload_codec"] for r in rows] == [None, codec.ZSTD]
+
+
+async def test_raw_payload__roundtrip_at_size_limit(app: AppFixture):
+    # Given: big enough that (de)compression runs off the event loop
+    channel = models.Channel("blobs")
+    payload = (b"compressible " * schema.MAX_RAW_PAYLOAD_BYTES)[: schema.MAX_RAW_PAYLOAD_BYTES]
+    await app.http.set_payload_mode(channel, raw=True)
+
+    # When
+    message_id = await app.http.publish_raw(channel, payload)
+    messages = await app.http.list_from_sequence(channel, 0)
+
+    # Then
+    assert [(m.id, m.payload) for m in messages] == [(message_id, payload)]
+
+
+async def test_raw_payload__413_when_body_exceeds_limit(app: AppFixture):
+    # Given
+    channel = models.Channel("blobs")
+    payload = b"x" * (schema.MAX_RAW_PAYLOAD_BYTES + 1)
+    await app.http.set_payload_mode(channel, raw=True)
+
+    async def chunked() -> AsyncIterator[bytes]:
+        for i in range(0, len(payload), 64 * 1024):
+            yield payload[i : i + 64 * 1024]
+
+    # When
+    sized = await app.http.request("POST", URL(f"/channels/{channel}/publish/raw"), content=payload)
+    streamed = await app.http.request("POST", URL(f"/channels/{channel}/publish/raw"), content=chunked())
+
+    # Then
+    assert sized.status_code == 413, sized.text
+    assert streamed.status_code == 413, streamed.text
+    assert await app.http.list_from_sequence(channel, 0) == []
+
+
+async def test_raw_payload__visible_in_unread_and_ackable(app: AppFixture):
+    # Given
+    channel = models.Channel("blobs")
+    consumer = models.Consumer("tester")
+    await app.http.set_payload_mode(channel, raw=True)
+    message_id = await app.http.publish_raw(channel, b"\x00\xff")
+
+    # When
+    unread = await app.http.list_unread(channel, consumer)
+    await app.http.ack(message_id, consumer)
+
+    # Then
+    assert [(m.id, m.payload) for m in unread] == [(message_id, b"\x00\xff")]
+    assert await app.http.list_unread(channel, consumer) == []
+
+
+async def test_raw_payload__409_raw_publish_to_json_channel(app: AppFixture):
+    # Given
+    channel = models.Channel("orders")
+
+    # When
+    resp = await app.http.request("POST", URL(f"/channels/{channel}/publish/raw"), content=b"blob")
+
+    # Then
+    assert resp.status_code == 409, resp.text
+    assert await app.http.list_from_sequence(channel, 0) == []
+
+
+async def test_raw_payload__409_json_publish_to_raw_channel(app: AppFixture):
+    # Given
+    channel = models.Channel("blobs")
+    await app.http.set_payload_mode(channel, raw=True)
+
+    # When
+    resp = await app.http.request("POST", URL(f"/channels/{channel}/publish"), json={"payload": {"k": "v"}})
+
+    # Then
+    assert resp.status_code == 409, resp.text
+
+
+async def test_raw_payload__opting_in_keeps_sequence_from_zero(app: AppFixture):
+    # Given
+    channel = models.Channel("blobs")
+    await app.http.set_payload_mode(channel, raw=True)
+
+    # When
+    first = await app.http.publish_raw(channel, b"first")
+
+    # Then
+    assert [m.id for m in await app.http.list_from_sequence(channel, 0)] == [first]
+    assert (await app.http.consumer_lag(channel, models.Consumer("c"))).published == 1
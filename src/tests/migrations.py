@@ -0,0 +1,20 @@
+import pathlib
+
+import asyncpg
+
+from messaging.adapters import repository
+
+MIGRATIONS_DIR = pathlib.Path(repository.__file__).parent / "migrations"
+
+
+async def apply_migrations(dsn: str, schema: str) -> None:
+    conn = await asyncpg.connect(dsn=dsn)
+    try:
+        _ = await conn.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+        for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+            sql = path.read_text(encoding="utf-8")
+            async with conn.transaction():
+                _ = await conn.execute(f'SET LOCAL search_path TO "{schema}"')
+                _ = await conn.execute(sql)
+    finally:
+        await conn.close()
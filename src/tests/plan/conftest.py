@@ -0,0 +1,45 @@
+from collections.abc import AsyncIterator, Awaitable, Callable
+import os
+import uuid
+
+import asyncpg
+import pytest_asyncio
+
+from messaging.adapters.repository.repo import Postgres
+
+from ..migrations import apply_migrations
+from . import dataset, plans
+from .plans import ExplainingConnection, Plan
+
+Explain = Callable[[Callable[[Postgres], Awaitable[object]]], Awaitable[Plan]]
+
+ROWS = int(os.environ.get("PLAN_TEST_ROWS", "1000000"))
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def seeded(pg_dsn: str) -> AsyncIterator[asyncpg.Connection]:
+    schema = f"plan_{uuid.uuid4().hex[:8]}"
+    await apply_migrations(pg_dsn, schema)
+    conn = await asyncpg.connect(dsn=pg_dsn, server_settings={"search_path": schema})
+    try:
+        await dataset.seed(conn, ROWS)
+        yield conn
+    finally:
+        _ = await conn.execute(f'DROP SCHEMA "{schema}" CASCADE')
+        await conn.close()
+
+
+@pytest_asyncio.fixture(loop_scope="session")
+async def explain(seeded: asyncpg.Connection) -> Explain:
+    async def run(op: Callable[[Postgres], Awaitable[object]]) -> Plan:
+        recorder = ExplainingConnection(seeded)
+        tx = seeded.transaction()
+        await tx.start()
+        try:
+            _ = await op(Postgres(recorder, tx))  # pyright: ignore[reportArgumentType]
+        finally:
+            await tx.rollback()
+        assert recorder.plans, "the operation ran no statements"
+        return plans.combine(recorder.plans)
+
+    return run
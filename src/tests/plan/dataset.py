@@ -0,0 +1,109 @@
+"""A skewed dataset shaped like production traffic.
+
+Half of all messages go to `HOT`, the rest are spread over a long tail of
+channels with a power-law skew, plus one small `COLD` channel. Consumers on
+`HOT` range from fully caught up to never having read anything.
+"""
+
+import asyncpg
+
+from messaging.domain import models
+
+HOT = models.Channel("hot")
+COLD = models.Channel("cold")
+COLD_ROWS = 1_000
+TAIL_CHANNELS = 1_000
+
+CAUGHT_UP = models.Consumer("caught-up")  # acked everything but the newest UNREAD_TAIL messages
+HALFWAY = models.Consumer("halfway")  # acked the oldest half
+FRESH = models.Consumer("fresh")  # acked nothing
+UNREAD_TAIL = 100
+
+
+async def seed(conn: asyncpg.Connection, rows: int) -> None:
+    # fixed seed so the tail-channel layout, and with it every buffer count, is the same on each run
+    _ = await conn.execute("SELECT setseed(0.42)")
+    # inserted in publish order so channels are interleaved on the heap like real traffic
+    _ = await conn.execute(
+        """
+        INSERT INTO messages (id, seq, channel, payload, published_at)
+        SELECT gen_random_uuid(), s.seq, s.channel, jsonb_build_object('n', s.n),
+               now() - make_interval(secs => $1 - s.n)
+        FROM (
+          SELECT c.n, c.channel, row_number() OVER (PARTITION BY c.channel ORDER BY c.n) - 1 AS seq
+          FROM (
+            SELECT n,
+                   CASE WHEN n % 2 = 0 THEN $2
+                        ELSE 'tail-' || floor(power(random(), 3) * $3::int)::int
+                   END AS channel
+            FROM generate_series(1, $1) AS n
+          ) c
+        ) s
+        ORDER BY s.n
+        """,
+        rows,
+        HOT,
+        TAIL_CHANNELS,
+    )
+    _ = await conn.execute(
+        """
+        INSERT INTO messages (id, seq, channel, payload, published_at)
+        SELECT gen_random_uuid(), n - 1, $1, jsonb_build_object('n', n), now()
+        FROM generate_series(1, $2) AS n
+        """,
+        COLD,
+        COLD_ROWS,
+    )
+    _ = await conn.execute(
+        """
+        INSERT INTO channel_sequences (channel, last_seq)
+        SELECT channel, max(seq) FROM messages GROUP BY channel
+        """
+    )
+    _ = await conn.execute(
+        """
+        INSERT INTO message_reads (message_id, consumer, read_at, channel, seq)
+        SELECT m.id, $2, now(), m.channel, m.seq
+        FROM messages m
+        WHERE m.channel = $1
+          AND m.seq <= (SELECT last_seq FROM channel_sequences WHERE channel = $1) - $3
+        """,
+        HOT,
+        CAUGHT_UP,
+        UNREAD_TAIL,
+    )
+    _ = await conn.execute(
+        """
+        INSERT INTO message_reads (message_id, consumer, read_at, channel, seq)
+        SELECT m.id, $2, now(), m.channel, m.seq
+        FROM messages m
+        WHERE m.channel = $1
+          AND m.seq < (SELECT last_seq FROM channel_sequences WHERE channel = $1) / 2
+        """,
+        HOT,
+        HALFWAY,
+    )
+    _ = await conn.execute(
+        """
+        INSERT INTO message_reads (message_id, consumer, read_at, channel, seq)
+        SELECT m.id, $2, now(), m.channel, m.seq
+        FROM messages m
+        WHERE m.channel = $1 AND m.seq < $3 / 2
+        """,
+        COLD,
+        CAUGHT_UP,
+        COLD_ROWS,
+    )
+    _ = await conn.execute(
+        """
+        INSERT INTO consumer_acks (channel, consumer, acked, acked_through)
+        SELECT m.channel, r.consumer, count(*), max(m.seq)  -- every consumer acked a prefix
+        FROM message_reads r
+        JOIN messages m ON m.id = r.message_id
+        GROUP BY m.channel, r.consumer
+        """
+    )
+    _ = await conn.execute("VACUUM ANALYZE messages")
+    _ = await conn.execute("VACUUM ANALYZE message_reads")
+    _ = await conn.execute("VACUUM ANALYZE channel_sequences")
+    _ = await conn.execute("VACUUM ANALYZE consumer_acks")
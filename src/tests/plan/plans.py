@@ -0,0 +1,90 @@
+from collections.abc import Iterator
+import json
+from typing import Any, TypeAlias
+
+import asyncpg
+
+Plan: TypeAlias = dict[str, Any]
+
+
+class ExplainingConnection:
+    """Wraps a connection that is inside a transaction and records the EXPLAIN ANALYZE
+    plan of every statement before running it for real. The EXPLAIN runs in a savepoint
+    that is rolled back, so writes are only applied once."""
+
+    def __init__(self, conn: asyncpg.Connection):
+        self._conn: asyncpg.Connection = conn
+        self.plans: list[Plan] = []
+
+    async def _explain(self, query: str, *args: object) -> None:
+        savepoint = self._conn.transaction()
+        await savepoint.start()
+        try:
+            raw = await self._conn.fetchval(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", *args)
+        finally:
+            await savepoint.rollback()
+        self.plans.append(json.loads(raw)[0]["Plan"])
+
+    async def fetch(self, query: str, *args: object, timeout: float | None = None) -> list[asyncpg.Record]:
+        await self._explain(query, *args)
+        return await self._conn.fetch(query, *args, timeout=timeout)
+
+    async def fetchrow(self, query: str, *args: object, timeout: float | None = None) -> asyncpg.Record | None:
+        await self._explain(query, *args)
+        return await self._conn.fetchrow(query, *args, timeout=timeout)
+
+    async def fetchval(self, query: str, *args: object, timeout: float | None = None) -> object:
+        await self._explain(query, *args)
+        return await self._conn.fetchval(query, *args, timeout=timeout)
+
+    async def execute(self, query: str, *args: object, timeout: float | None = None) -> str:
+        await self._explain(query, *args)
+        return await self._conn.execute(query, *args, timeout=timeout)
+
+
+def combine(statements: list[Plan]) -> Plan:
+    """One plan for an operation that runs several statements, with their buffers summed."""
+    if len(statements) == 1:
+        return statements[0]
+    return {
+        "Node Type": "Statements",
+        "Plans": statements,
+        "Shared Hit Blocks": sum(int(p["Shared Hit Blocks"]) for p in statements),
+        "Shared Read Blocks": sum(int(p["Shared Read Blocks"]) for p in statements),
+    }
+
+
+def walk(node: Plan) -> Iterator[Plan]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk(child)
+
+
+def scans(plan: Plan, relation: str) -> list[Plan]:
+    return [n for n in walk(plan) if n.get("Relation Name") == relation and n["Node Type"].endswith("Scan")]
+
+
+def buffers(plan: Plan) -> int:
+    return int(plan["Shared Hit Blocks"]) + int(plan["Shared Read Blocks"])
+
+
+def expect_index_scans_only(plan: Plan, relation: str, index: str | None = None) -> None:
+    found = scans(plan, relation)
+    assert found, f"no scan on {relation}:\n{json.dumps(plan, indent=2)}"
+    for node in found:
+        assert node["Node Type"] != "Seq Scan", f"seq scan on {relation}:\n{json.dumps(plan, indent=2)}"
+        if index is not None:
+            assert _index_name(node) == index, f"expected {index} on {relation}:\n{json.dumps(plan, indent=2)}"
+
+
+def _index_name(node: Plan) -> str | None:
+    # a bitmap heap scan names its index on the bitmap index scan below it
+    if node["Node Type"] == "Bitmap Heap Scan":
+        [child] = node["Plans"]
+        return child.get("Index Name")
+    return node.get("Index Name")
+
+
+def expect_buffers_at_most(plan: Plan, budget: int) -> None:
+    used = buffers(plan)
+    assert used <= budget, f"used {used} buffers, budget is {budget}:\n{json.dumps(plan, indent=2)}"
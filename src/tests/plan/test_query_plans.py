@@ -0,0 +1,189 @@
+"""Plan-shape and buffer-budget checks for every repository query at production size.
+
+Run with `make test-plan`. Buffer budgets are deliberately loose multiples of
+what the current plans use; a plan that falls back to scanning a whole channel
+or table blows through them by orders of magnitude.
+"""
+
+from datetime import datetime
+import inspect
+import uuid
+
+import asyncpg
+import pytest
+
+from messaging.adapters.repository.repo import Postgres
+from messaging.domain import models
+
+from . import dataset, plans
+from .conftest import Explain
+
+pytestmark = [pytest.mark.plan, pytest.mark.asyncio(loop_scope="session")]
+
+# buffers used by the current list_unread plans on HOT at the default PLAN_TEST_ROWS;
+# the budgets allow twice that, and smaller datasets stay well within them
+LIST_UNREAD_HOT_MEASURED = {dataset.CAUGHT_UP: 12, dataset.HALFWAY: 6_851, dataset.FRESH: 13_695}
+
+COVERED = {
+    "add",
+    "add_fanout",
+    "set_payload_mode",
+    "list_unread",
+    "list_from_sequence",
+    "mark_read",
+    "consumer_lag",
+    "list_consumer_lag",
+}
+
+
+async def test_plans__every_repository_query_is_covered():
+    queries = {
+        name
+        for name, fn in inspect.getmembers(Postgres, inspect.iscoroutinefunction)
+        if not name.startswith("_") and name != "commit"
+    }
+    assert queries == COVERED, "add a plan test for new repository queries and list them in COVERED"
+
+
+async def test_plans__add_to_hot_channel(explain: Explain):
+    # Given
+    msg = models.Message(
+        id=models.MessageID(uuid.uuid4()),
+        channel=dataset.HOT,
+        payload={"k": "v"},
+        published_at=datetime.now(),
+    )
+
+    # When
+    plan = await explain(lambda tx: tx.add(msg))
+
+    # Then
+    plans.expect_buffers_at_most(plan, 100)
+
+
+async def test_plans__add_with_idempotency_key_replay(seeded: asyncpg.Connection, explain: Explain):
+    # Given: a hot-channel message that was published with an idempotency key
+    key = f"key-{uuid.uuid4()}"
+    original = models.MessageID(uuid.uuid4())
+    _ = await seeded.execute(
+        """
+        INSERT INTO messages (id, seq, channel, payload, published_at, idempotency_key)
+        VALUES ($1, -1, $2, '{}'::jsonb, now(), $3)
+        """,
+        original,
+        dataset.HOT,
+        key,
+    )
+    retry = models.Message(
+        id=models.MessageID(uuid.uuid4()),
+        channel=dataset.HOT,
+        payload={"k": "v"},
+        published_at=datetime.now(),
+    )
+
+    try:
+        # When
+        plan = await explain(lambda tx: tx.add(retry, key))
+    finally:
+        _ = await seeded.execute("DELETE FROM messages WHERE id = $1", original)
+
+    # Then
+    plans.expect_index_scans_only(plan, "messages", "idx_messages_channel_idempotency_key")
+    plans.expect_buffers_at_most(plan, 20)
+
+
+async def test_plans__add_fanout_to_hot_cold_and_new_channels(explain: Explain):
+    # Given
+    published_at = datetime.now()
+    msgs = [
+        models.Message(
+            id=models.MessageID(uuid.uuid4()),
+            channel=channel,
+            payload={"k": "v"},
+            published_at=published_at,
+        )
+        for channel in (dataset.HOT, dataset.COLD, models.Channel("tail-1"), models.Channel("brand-new"))
+    ]
+
+    # When
+    plan = await explain(lambda tx: tx.add_fanout(msgs))
+
+    # Then
+    plans.expect_buffers_at_most(plan, 100 * len(msgs))
+
+
+async def test_plans__set_payload_mode(explain: Explain):
+    # When
+    plan = await explain(lambda tx: tx.set_payload_mode(dataset.COLD, True))
+
+    # Then
+    assert not plans.scans(plan, "messages")
+    plans.expect_buffers_at_most(plan, 20)
+
+
+async def test_plans__list_from_sequence_tail_of_hot_channel(seeded: asyncpg.Connection, explain: Explain):
+    # Given
+    last_seq: int = await seeded.fetchval("SELECT last_seq FROM channel_sequences WHERE channel = $1", dataset.HOT)
+
+    # When
+    plan = await explain(lambda tx: tx.list_from_sequence(dataset.HOT, last_seq - 100))
+
+    # Then
+    plans.expect_index_scans_only(plan, "messages", "idx_messages_channel_seq")
+    plans.expect_buffers_at_most(plan, 200)
+
+
+async def test_plans__list_unread_cold_channel(explain: Explain):
+    # When
+    plan = await explain(lambda tx: tx.list_unread(dataset.COLD, dataset.CAUGHT_UP))
+
+    # Then
+    plans.expect_index_scans_only(plan, "messages", "idx_messages_channel_seq")
+    plans.expect_index_scans_only(plan, "message_reads", "idx_message_reads_consumer_channel_seq")
+    plans.expect_buffers_at_most(plan, 8 * dataset.COLD_ROWS)
+
+
+@pytest.mark.parametrize("consumer", [dataset.CAUGHT_UP, dataset.HALFWAY, dataset.FRESH])
+async def test_plans__list_unread_hot_channel(explain: Explain, consumer: models.Consumer):
+    # When: a consumer that is UNREAD_TAIL messages, half, or all of a hot channel behind
+    plan = await explain(lambda tx: tx.list_unread(dataset.HOT, consumer))
+
+    # Then: only the part of the channel past the consumer's watermark is read
+    plans.expect_index_scans_only(plan, "messages", "idx_messages_channel_seq")
+    plans.expect_index_scans_only(plan, "message_reads", "idx_message_reads_consumer_channel_seq")
+    plans.expect_buffers_at_most(plan, 2 * LIST_UNREAD_HOT_MEASURED[consumer])
+
+
+async def test_plans__mark_read_on_hot_channel(seeded: asyncpg.Connection, explain: Explain):
+    # Given
+    message_id: models.MessageID = await seeded.fetchval(
+        "SELECT id FROM messages WHERE channel = $1 ORDER BY seq DESC LIMIT 1", dataset.HOT
+    )
+
+    # When
+    plan = await explain(lambda tx: tx.mark_read(message_id, dataset.FRESH, datetime.now()))
+
+    # Then
+    plans.expect_index_scans_only(plan, "messages")
+    plans.expect_index_scans_only(plan, "message_reads", "idx_message_reads_consumer_channel_seq")
+    plans.expect_buffers_at_most(plan, 100)
+
+
+async def test_plans__consumer_lag_does_not_touch_the_backlog(explain: Explain):
+    # When
+    plan = await explain(lambda tx: tx.consumer_lag(dataset.HOT, dataset.HALFWAY))
+
+    # Then
+    assert not plans.scans(plan, "messages")
+    assert not plans.scans(plan, "message_reads")
+    plans.expect_buffers_at_most(plan, 20)
+
+
+async def test_plans__list_consumer_lag_does_not_touch_the_backlog(explain: Explain):
+    # When
+    plan = await explain(lambda tx: tx.list_consumer_lag(dataset.HOT))
+
+    # Then
+    assert not plans.scans(plan, "messages")
+    assert not plans.scans(plan, "message_reads")
+    plans.expect_buffers_at_most(plan, 50)